@@ -1,18 +1,43 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from pydantic import BaseModel
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-import openai
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from openai import AsyncOpenAI
 from google import genai
-import sqlparse
+from cachetools import TTLCache
+import httpx
+import orjson
+import sqlglot
+from sqlglot import exp
+import asyncio
+import functools
+import hashlib
+import json
+import operator
+import os
 import re
-from typing import List, Dict, Any
+import sys
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Union
 import datetime
 from urllib.parse import quote_plus
 
-app = FastAPI(title="SQL Chat By Dhanraj D. Hasure")
+# Lifespan: nothing to warm up front (credentials arrive per request), but
+# cached engines are disposed cleanly on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    for engine in _ENGINE_CACHE.values():
+        await engine.dispose()
+    _ENGINE_CACHE.clear()
+
+app = FastAPI(title="SQL Chat By Dhanraj D. Hasure", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -40,121 +65,663 @@ class QueryRequest(Config):
     schema: str = ""
 
 
+# TTLCache that also enforces an approximate byte budget. Keys are tuples
+# whose first element tags the tenant; each tenant only gets a share of the
+# budget so one chatty tenant cannot evict everyone else's entries.
+class SizedTTLCache(TTLCache):
+    def __init__(self, maxsize: int, ttl: float, maxbytes: Optional[int] = None, tenant_share: float = 0.25):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        if maxbytes is None:
+            maxbytes = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.maxbytes = maxbytes
+        self.tenant_maxbytes = max(1, int(maxbytes * tenant_share))
+        self.nbytes = 0
+        self._entry_bytes: Dict[Any, int] = {}
+        self._tenant_bytes: Dict[Any, int] = defaultdict(int)
+
+    @staticmethod
+    def _tenant_of(key) -> Any:
+        return key[0] if isinstance(key, tuple) and key else None
+
+    @staticmethod
+    def _entry_size(key, value) -> int:
+        value_size = len(value) if isinstance(value, (str, bytes)) else sys.getsizeof(value)
+        return sys.getsizeof(key) + value_size
+
+    # Dropping an entry from the byte accounting
+    def _discount(self, key):
+        size = self._entry_bytes.pop(key, 0)
+        self.nbytes -= size
+        tenant = self._tenant_of(key)
+        self._tenant_bytes[tenant] -= size
+        if self._tenant_bytes[tenant] <= 0:
+            self._tenant_bytes.pop(tenant, None)
+
+    # Deleting the oldest entry belonging to one tenant
+    def _pop_oldest(self, tenant):
+        for key in self:
+            if self._tenant_of(key) == tenant:
+                del self[key]
+                return
+        self._tenant_bytes.pop(tenant, None)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in self._entry_bytes:
+            self._discount(key)
+        size = self._entry_size(key, value)
+        self._entry_bytes[key] = size
+        self.nbytes += size
+        tenant = self._tenant_of(key)
+        self._tenant_bytes[tenant] += size
+
+        # Shed this tenant's oldest entries past its share, then LRU overall
+        while self._tenant_bytes.get(tenant, 0) > self.tenant_maxbytes:
+            self._pop_oldest(tenant)
+        while self.nbytes > self.maxbytes and len(self) > 0:
+            self.popitem()
+
+    def __delitem__(self, key):
+        try:
+            super().__delitem__(key)
+        finally:
+            self._discount(key)
+
+    # TTLCache.expire removes entries without calling __delitem__, so the
+    # accounting has to be reconciled here as well
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for key, _ in expired:
+            self._discount(key)
+        return expired
+
+
 def get_db_url(config: Config) -> str:
     user = quote_plus(config.dbUser)
     password = quote_plus(config.dbPassword)
 
     if config.dbType == "postgresql":
-        return f"postgresql+psycopg2://{user}:{password}@{config.dbHost}:{config.dbPort}/{config.dbName}"
+        return f"postgresql+asyncpg://{user}:{password}@{config.dbHost}:{config.dbPort}/{config.dbName}"
 
     if config.dbType == "mysql":
-        return f"mysql+pymysql://{user}:{password}@{config.dbHost}:{config.dbPort}/{config.dbName}?charset=utf8mb4"
+        return f"mysql+aiomysql://{user}:{password}@{config.dbHost}:{config.dbPort}/{config.dbName}?charset=utf8mb4"
 
     raise ValueError(f"Unsupported database type: {config.dbType}")
 
-# Getting schema query for the database type
-def get_schema_query(config: Config) -> str:
-    # postgresql schema query
-    if config.dbType == "postgresql":
-        return """
-            SELECT table_name, column_name, data_type 
-            FROM information_schema.columns 
-            WHERE table_schema = 'public' 
-            ORDER BY table_name;
-        """
-    else:  # mysql schema query
-        return f"""
-            SELECT table_name, column_name, data_type 
-            FROM information_schema.columns 
-            WHERE table_schema = '{config.dbName}' 
-            ORDER BY table_name;
-        """
+# Cache of engines so the connection pool survives across requests; a small
+# LRU so abandoned or garbage credentials can't pin pools until shutdown
+_MAX_ENGINES = int(os.getenv("MAX_DB_ENGINES", "32"))
+_ENGINE_CACHE: OrderedDict = OrderedDict()
+
+# Cache key for an engine (password is hashed, never stored raw)
+def get_engine_key(config: Config) -> tuple:
+    return (
+        config.dbType,
+        config.dbHost,
+        config.dbPort,
+        config.dbName,
+        config.dbUser,
+        hashlib.blake2b(config.dbPassword.encode()).digest(),
+    )
+
+# Getting a pooled async engine for the config, creating it on first use
+def get_engine(config: Config):
+    key = get_engine_key(config)
+    engine = _ENGINE_CACHE.get(key)
+    if engine is None:
+        engine = _ENGINE_CACHE.setdefault(key, create_async_engine(
+            get_db_url(config),
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=5,
+            max_overflow=10,
+            pool_recycle=1800,
+            pool_pre_ping=True,
+        ))
+    _ENGINE_CACHE.move_to_end(key)
+    while len(_ENGINE_CACHE) > _MAX_ENGINES:
+        _, evicted = _ENGINE_CACHE.popitem(last=False)
+        asyncio.create_task(evicted.dispose())
+    return engine
+
+# Schema query shared by both database types, with the schema name bound as a
+# parameter so the server can reuse the cached plan across calls
+_SCHEMA_QUERY = text("""
+    SELECT table_name, column_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = :schema
+    ORDER BY table_name, ordinal_position
+""")
+
+# Getting the schema name to introspect for the database type
+def get_schema_name(config: Config) -> str:
+    return "public" if config.dbType == "postgresql" else config.dbName
+
+# Cache of formatted schema strings so repeated fetches skip the catalog scan
+_SCHEMA_CACHE = SizedTTLCache(maxsize=1024, ttl=300)
+
+# Cache key for a schema (host first: it doubles as the tenant tag)
+def get_schema_cache_key(config: Config) -> tuple:
+    return (config.dbHost, config.dbType, config.dbPort, config.dbName)
+
+# Provider clients cached per hashed API key (never the raw key, same as the
+# engine cache) in small LRUs; evicted clients are closed in the background so
+# garbage keys from probing can't leak connection pools and file descriptors
+_MAX_PROVIDER_CLIENTS = int(os.getenv("MAX_PROVIDER_CLIENTS", "32"))
+_OPENAI_CLIENTS: OrderedDict = OrderedDict()
+_GEMINI_CLIENTS: OrderedDict = OrderedDict()
+
+# Getting an async OpenAI client for the API key, creating it on first use.
+# The explicit HTTP/2 client keeps one multiplexed connection warm across
+# requests instead of re-doing the TLS handshake per call
+def get_openai_client(api_key: str) -> AsyncOpenAI:
+    tag = get_tenant_tag(api_key)
+    client = _OPENAI_CLIENTS.get(tag)
+    if client is None:
+        client = _OPENAI_CLIENTS.setdefault(tag, AsyncOpenAI(
+            api_key=api_key,
+            timeout=30.0,
+            max_retries=2,
+            http_client=httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            ),
+        ))
+    _OPENAI_CLIENTS.move_to_end(tag)
+    while len(_OPENAI_CLIENTS) > _MAX_PROVIDER_CLIENTS:
+        _, evicted = _OPENAI_CLIENTS.popitem(last=False)
+        asyncio.create_task(evicted.close())
+    return client
+
+# Getting a Gemini client for the API key, creating it on first use
+def get_gemini_client(api_key: str) -> genai.Client:
+    tag = get_tenant_tag(api_key)
+    client = _GEMINI_CLIENTS.get(tag)
+    if client is None:
+        client = _GEMINI_CLIENTS.setdefault(tag, genai.Client(api_key=api_key))
+    _GEMINI_CLIENTS.move_to_end(tag)
+    while len(_GEMINI_CLIENTS) > _MAX_PROVIDER_CLIENTS:
+        _, evicted = _GEMINI_CLIENTS.popitem(last=False)
+        asyncio.create_task(evicted.aio.aclose())
+    return client
+
+# Bounding in-flight LLM calls so bursts stay under provider rate limits
+_LLM_SEM = asyncio.Semaphore(int(os.getenv("MAX_LLM_CONCURRENCY", "8")))
+
+# Caches of LLM output so repeated (or re-phrased) questions skip the provider call
+_SQL_CACHE = SizedTTLCache(maxsize=4096, ttl=3600)
+_SUMMARY_CACHE = SizedTTLCache(maxsize=4096, ttl=3600)
+
+# Tenant tag derived from the API key, used for per-tenant cache budgets
+def get_tenant_tag(api_key: str) -> str:
+    return hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+
+# Cache key from the normalized question plus a schema fingerprint
+def get_sql_cache_key(request: QueryRequest) -> tuple:
+    question = " ".join(request.query.lower().split())
+    schema_fp = hashlib.blake2b(request.schema.encode()).hexdigest()
+    digest = hashlib.blake2b(f"{request.dbType}|{question}|{schema_fp}".encode()).hexdigest()
+    return (get_tenant_tag(request.apiKey), digest)
+
+# Cache key from the normalized question plus a fingerprint of the results
+def get_summary_cache_key(request: QueryRequest, results: List[Dict]) -> tuple:
+    question = " ".join(request.query.lower().split())
+    sample_fp = hashlib.blake2b(str(results[:3]).encode()).hexdigest()
+    digest = hashlib.blake2b(f"{question}|{len(results)}|{sample_fp}".encode()).hexdigest()
+    return (get_tenant_tag(request.apiKey), digest)
+
+# Pre-computed metrics for common aggregate questions, keyed by (engine, table).
+# Credentials only arrive with each request, so entries refresh lazily with a
+# short TTL instead of from a startup loop.
+_METRICS = TTLCache(maxsize=1024, ttl=60)
+
+# Question shapes that map straight to a row count on one table
+_METRIC_PATTERNS = [
+    re.compile(r"^how many (?P<table>[a-z_][a-z0-9_]*)(?: are there| do we have| exist)?\??$"),
+    re.compile(r"^(?:total )?(?:number|count) of (?P<table>[a-z_][a-z0-9_]*)\??$"),
+]
+
+# Matching a normalized question to a metric table name, if any
+def match_metric(question: str) -> Optional[str]:
+    for pattern in _METRIC_PATTERNS:
+        match = pattern.match(question)
+        if match:
+            return match.group("table")
+    return None
+
+# Getting the cached row count for a table, refreshing it when stale
+async def get_metric(request: QueryRequest, table: str) -> Any:
+    key = get_engine_key(request) + (table,)
+    value = _METRICS.get(key)
+    if value is not None:
+        return value
+
+    rows = await run_select(request, f"SELECT COUNT(*) AS total FROM {table}")
+    value = rows[0]["total"]
+    _METRICS[key] = value
+    return value
+
+# Markdown ```sql fence pattern, compiled once instead of per call
+_FENCE_RE = re.compile(r"^```sql\s*|\s*```$", re.MULTILINE)
+
+# Stripping leading whitespace and SQL comments before the keyword check
+def strip_leading_comments(sql: str) -> str:
+    s = sql.lstrip()
+    while True:
+        if s.startswith("--"):
+            _, _, s = s.partition("\n")
+        elif s.startswith("/*"):
+            _, sep, s = s.partition("*/")
+            if not sep:
+                return ""
+        else:
+            return s
+        s = s.lstrip()
+
+# sqlglot dialect names for the supported database types
+_SQLGLOT_DIALECTS = {"postgresql": "postgres", "mysql": "mysql"}
+
+# AST nodes that must not appear anywhere in an allowed query, even inside
+# CTEs; Into covers SELECT ... INTO, a write disguised as a SELECT
+_FORBIDDEN_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge,
+    exp.Create, exp.Drop, exp.Alter, exp.TruncateTable,
+    exp.Grant, exp.Command, exp.Into,
+)
 
 # Ensuring only SELECT queries are executed
-def is_safe_select(sql: str) -> bool:
-    parsed = sqlparse.parse(sql)
-    for stmt in parsed:
-        if stmt.get_type() != "SELECT":
-            return False
-    return True
+def is_safe_select(sql: str, db_type: str = "postgresql") -> bool:
+    # Fast path: reject anything whose first keyword is not SELECT or WITH
+    head = strip_leading_comments(sql).lstrip("(").lstrip().upper()
+    if not head.startswith("SELECT") and not head.startswith("WITH"):
+        return False
+
+    try:
+        statements = sqlglot.parse(sql, read=_SQLGLOT_DIALECTS.get(db_type, "postgres"))
+    except sqlglot.errors.ParseError:
+        return False
+
+    if len(statements) != 1 or statements[0] is None:
+        return False
+
+    # SetOperation covers UNION as well as EXCEPT and INTERSECT
+    statement = statements[0]
+    if not isinstance(statement, (exp.Select, exp.SetOperation)):
+        return False
+
+    # Catch DML hidden in CTEs (e.g. WITH d AS (DELETE ...) SELECT ...)
+    return not any(isinstance(node, _FORBIDDEN_NODES) for node in statement.walk())
+
+# Stripping fences and validating, memoized so re-executed SQL (pagination,
+# retries, cached LLM output) skips the regex and parse work entirely
+@functools.lru_cache(maxsize=8192)
+def clean_and_validate(db_type: str, query: str) -> str:
+    cleaned = _FENCE_RE.sub("", query).strip()
+    if not is_safe_select(cleaned, db_type):
+        raise ValueError("Only SELECT queries are allowed")
+    return cleaned
 
 # Fetching schema from the database
 @app.post("/api/schema")
 async def fetch_schema(config: Config):
     try:
-        db_url = get_db_url(config)
-        engine = create_engine(db_url, pool_pre_ping=True)
-        schema_query = get_schema_query(config)
-        
-        with engine.connect() as connection:
-            result = connection.execute(text(schema_query))
-            schema_info = {}
-            for row in result:
+        # Serve from cache while the entry is still fresh
+        cache_key = get_schema_cache_key(config)
+        cached_schema = _SCHEMA_CACHE.get(cache_key)
+        if cached_schema is not None:
+            return {"schema": cached_schema}
+
+        engine = get_engine(config)
+
+        async with engine.connect() as connection:
+            # Stream rows via a server-side cursor so large catalogs are not
+            # buffered in full before the schema string is built
+            result = await connection.stream(
+                _SCHEMA_QUERY.bindparams(schema=get_schema_name(config))
+            )
+            schema_info: Dict[str, List[str]] = defaultdict(list)
+            async for row in result:
                 table, column, data_type = row
-                if table not in schema_info:
-                    schema_info[table] = []
                 schema_info[table].append(f"{column} ({data_type})")
-            
-            formatted_schema = "\n".join(
-                f"Table: {table}\nColumns: {', '.join(columns)}\n"
-                for table, columns in schema_info.items()
-            )
-            
-            return {"schema": formatted_schema.strip()}
+
+            # One flat parts list joined once, instead of nested joins that
+            # re-traverse every column list through generator frames
+            parts: List[str] = []
+            for table, columns in schema_info.items():
+                parts.append("Table: ")
+                parts.append(table)
+                parts.append("\nColumns: ")
+                parts.append(", ".join(columns))
+                parts.append("\n\n")
+            formatted_schema = "".join(parts).strip()
+            _SCHEMA_CACHE[cache_key] = formatted_schema
+            return {"schema": formatted_schema}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Schema fetch failed: {str(e)}")
 
+# Dropping the cached schema after DDL changes so the next fetch re-reads it
+@app.post("/api/schema/invalidate")
+async def invalidate_schema(config: Config):
+    _SCHEMA_CACHE.pop(get_schema_cache_key(config), None)
+    return {"status": "invalidated"}
+
 # Executing direct SQL query (SELECT only)
 @app.post("/api/execute")
 async def execute_query(request: QueryRequest):
     try:
-        query = request.query.strip()
-        
-        # Remove markdown code blocks if present
-        query = re.sub(r"^```sql\s*|\s*```$", "", query, flags=re.MULTILINE)
-        
-        # Validate it's a SELECT query
-        if not is_safe_select(query):
+        # Strip markdown fences and validate (memoized across executions)
+        try:
+            query = clean_and_validate(request.dbType, request.query.strip())
+        except ValueError:
             raise HTTPException(status_code=400, detail="Only SELECT queries are allowed")
-        
-        db_url = get_db_url(request)
-        engine = create_engine(db_url, pool_pre_ping=True)
-        
-        with engine.connect() as connection:
-            result = connection.execute(text(query))
-            columns = result.keys()
-            results = [dict(zip(columns, row)) for row in result.fetchall()]
-            
-            return {"query": query, "results": results}
+
+
+        results = await run_select(request, query)
+
+        return {"query": query, "results": results}
     except SQLAlchemyError as e:
         raise HTTPException(status_code=400, detail=f"SQL execution failed: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Bounded cache of query results; a later query whose predicates only tighten
+# a cached one is answered by filtering the cached rows in-process
+_RESULT_CACHE: OrderedDict = OrderedDict()
+_RESULT_CACHE_TTL = 60  # seconds
+_RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+_result_cache_nbytes = 0
+
+# Comparison operators we can re-evaluate in-process on cached rows
+_COMPARE_OPS = {
+    exp.EQ: operator.eq,
+    exp.NEQ: operator.ne,
+    exp.GT: operator.gt,
+    exp.GTE: operator.ge,
+    exp.LT: operator.lt,
+    exp.LTE: operator.le,
+}
+
+# Flattening a WHERE clause into its AND-ed conjuncts
+def iter_conjuncts(node):
+    if isinstance(node, exp.And):
+        yield from iter_conjuncts(node.left)
+        yield from iter_conjuncts(node.right)
+    else:
+        yield node
+
+# Breaking a query into (base form without predicates, conjunct map, projected
+# columns); None when the shape is too complex to reuse cached rows safely
+def get_coverage_info(query: str, db_type: str) -> Optional[tuple]:
+    dialect = _SQLGLOT_DIALECTS.get(db_type, "postgres")
+    try:
+        tree = sqlglot.parse_one(query, read=dialect)
+    except sqlglot.errors.ParseError:
+        return None
+    if not isinstance(tree, exp.Select):
+        return None
+
+    # Aggregation, grouping, limits etc. make superset filtering incorrect
+    for arg in ("group", "having", "limit", "offset", "distinct", "with"):
+        if tree.args.get(arg):
+            return None
+    if any(isinstance(node, (exp.AggFunc, exp.Window)) for node in tree.walk()):
+        return None
+
+    # Only plain column projections (or *) can be re-projected from cached rows
+    columns: Optional[List[str]] = []
+    for proj in tree.expressions:
+        if isinstance(proj, exp.Star):
+            columns = None
+            break
+        if isinstance(proj, exp.Column):
+            columns.append(proj.name)
+        else:
+            return None
+
+    conjuncts: Dict[str, Any] = {}
+    where = tree.args.get("where")
+    if where is not None:
+        for cond in iter_conjuncts(where.this):
+            conjuncts[cond.sql(dialect)] = cond
+
+    base = tree.copy()
+    base.set("where", None)
+    base.set("expressions", [exp.Star()])
+    return (base.sql(dialect), conjuncts, columns)
+
+# Sentinel distinguishing "key absent from the row" from a stored SQL NULL
+_MISSING = object()
+
+# Compiling a `column <op> literal` conjunct into a row predicate, or None.
+# Predicates return None for a cell they can't compare with the database's
+# own semantics; the caller must treat that as a cache miss, never a filter
+def compile_predicate(node, db_type: str):
+    op = _COMPARE_OPS.get(type(node))
+    if op is None:
+        return None
+    left, right = node.this, node.args.get("expression")
+    if not isinstance(left, exp.Column) or not isinstance(right, exp.Literal):
+        return None
+    # A qualified column (a.id) can't be resolved by bare name against
+    # SELECT *-over-join rows without risking the wrong table's column
+    if left.table:
+        return None
+
+    column = left.name
+    if right.is_string:
+        # MySQL's default collations compare case-insensitively and string
+        # ordering is collation-dependent everywhere, so only exact string
+        # (in)equality on Postgres is safe to re-evaluate in-process
+        if db_type == "mysql" or op not in (operator.eq, operator.ne):
+            return None
+        value: Any = right.name
+
+        def predicate(row: Dict) -> Optional[bool]:
+            cell = row.get(column, _MISSING)
+            if cell is _MISSING:
+                return None  # key absent (e.g. unquoted-name case mismatch)
+            if cell is None:
+                return False  # SQL comparisons with NULL never match
+            if not isinstance(cell, str):
+                return None
+            return op(cell, value)
+
+        return predicate
+
+    try:
+        value = int(right.name)
+    except ValueError:
+        try:
+            value = float(right.name)
+        except ValueError:
+            return None
+
+    def predicate(row: Dict) -> Optional[bool]:
+        cell = row.get(column, _MISSING)
+        if cell is _MISSING:
+            return None  # key absent (e.g. unquoted-name case mismatch)
+        if cell is None:
+            return False  # SQL comparisons with NULL never match
+        # No coercion: Decimal or text cells force a miss instead of a
+        # lossy float() round-trip that could filter differently than SQL
+        if isinstance(cell, bool) or not isinstance(cell, (int, float)):
+            return None
+        return op(cell, value)
+
+    return predicate
+
+# Serving a query from a cached superset entry, or None when it can't
+def serve_from_cached(entry: Dict, conjuncts: Dict[str, Any], columns: Optional[List[str]], db_type: str):
+    if not entry["predicates"] <= set(conjuncts):
+        return None
+    if columns is None:
+        if entry["columns"] is not None:
+            return None  # new query wants *, cached rows are projected
+    elif entry["columns"] is not None and not set(columns) <= set(entry["columns"]):
+        return None
+
+    residual = set(conjuncts) - entry["predicates"]
+
+    # Every column the residual conjuncts reference must exist in the cached
+    # rows, otherwise filtering would silently drop rows the DB would return
+    if entry["columns"] is not None:
+        needed = {
+            col.name
+            for s in residual
+            for col in conjuncts[s].find_all(exp.Column)
+        }
+        if not needed <= set(entry["columns"]):
+            return None
+
+    predicates = [compile_predicate(conjuncts[s], db_type) for s in residual]
+    if any(p is None for p in predicates):
+        return None
+
+    rows = []
+    for r in entry["rows"]:
+        keep = True
+        for p in predicates:
+            verdict = p(r)
+            if verdict is None:
+                return None  # incomparable cell: fall back to the database
+            if not verdict:
+                keep = False
+                break
+        if keep:
+            rows.append(r)
+    if columns is not None and (entry["columns"] is None or set(columns) != set(entry["columns"])):
+        if rows and not set(columns) <= set(rows[0]):
+            return None
+        rows = [{c: r[c] for c in columns} for r in rows]
+    return rows
+
+# Storing a result set, evicting oldest entries past the byte budget
+def store_result(key: tuple, conjuncts: Dict[str, Any], columns: Optional[List[str]], rows: List[Dict]):
+    global _result_cache_nbytes
+
+    existing = _RESULT_CACHE.get(key)
+    if existing is not None:
+        if (time.time() - existing["fetched_at"] < _RESULT_CACHE_TTL
+                and existing["predicates"] <= set(conjuncts)):
+            return  # keep the broader (or equal) entry already cached
+        _result_cache_nbytes -= existing["nbytes"]
+        del _RESULT_CACHE[key]
+
+    nbytes = sys.getsizeof(rows) + sum(sys.getsizeof(r) for r in rows)
+    if nbytes > _RESULT_CACHE_MAX_BYTES // 4:
+        return  # never let one result set dominate the budget
+
+    _RESULT_CACHE[key] = {
+        "predicates": set(conjuncts),
+        "columns": columns,
+        "rows": rows,
+        "fetched_at": time.time(),
+        "nbytes": nbytes,
+    }
+    _result_cache_nbytes += nbytes
+    while _result_cache_nbytes > _RESULT_CACHE_MAX_BYTES and _RESULT_CACHE:
+        _, evicted = _RESULT_CACHE.popitem(last=False)
+        _result_cache_nbytes -= evicted["nbytes"]
+
+# Running one already-validated SELECT and returning its rows
+async def run_select(config: Config, query: str) -> List[Dict]:
+    info = get_coverage_info(query, config.dbType)
+    if info is not None:
+        base_sql, conjuncts, columns = info
+        cache_key = (get_engine_key(config), base_sql)
+        entry = _RESULT_CACHE.get(cache_key)
+        if entry is not None and time.time() - entry["fetched_at"] < _RESULT_CACHE_TTL:
+            cached_rows = serve_from_cached(entry, conjuncts, columns, config.dbType)
+            if cached_rows is not None:
+                return cached_rows
+
+    engine = get_engine(config)
+    async with engine.connect() as connection:
+        result = await connection.execute(text(query))
+        rows = [dict(row) for row in result.mappings()]
+
+    if info is not None:
+        store_result(cache_key, conjuncts, columns, rows)
+    return rows
+
+# Running decomposed sub-queries concurrently under a small semaphore
+async def run_subqueries(request: QueryRequest, queries: List[str]) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(4)
+
+    async def run(q: str):
+        async with sem:
+            return await run_select(request, q)
+
+    # return_exceptions so one failing sub-query doesn't discard the batch
+    outcomes = await asyncio.gather(*[run(q) for q in queries], return_exceptions=True)
+
+    merged: Dict[str, Any] = {}
+    for q, outcome in zip(queries, outcomes):
+        if isinstance(outcome, Exception):
+            merged[q] = {"error": str(outcome)}
+        else:
+            merged[q] = outcome
+    return merged
+
 # Generating SQL from natural language using AI
 @app.post("/api/generate")
 async def generate_query(request: QueryRequest):
     try:
-        # Generate SQL query using AI
+        # Serve common aggregate questions from the metric cache, skipping
+        # both LLM round trips (table name is regex-bound and must appear in
+        # the provided schema, so nothing user-controlled reaches the SQL)
+        table = match_metric(" ".join(request.query.lower().split()))
+        if table is not None and f"Table: {table}" in request.schema:
+            try:
+                count = await get_metric(request, table)
+                return {
+                    "sql_query": f"SELECT COUNT(*) AS total FROM {table}",
+                    "results": [{"total": count}],
+                    "summary": f"There are {count} {table}.",
+                }
+            except SQLAlchemyError:
+                pass  # fall through to the normal LLM path
+
+        # Generate SQL query using AI (a list when the question decomposes)
         sql_query = await generate_sql_with_ai(request)
-        
-        # Execute the generated query
-        request.query = sql_query
-        result = await execute_query(request)
-        
-        # Generate summary of the results
-        summary = await generate_summary(request, result["results"])
-        
-        return {
+
+        if isinstance(sql_query, list):
+            # Execute the independent sub-queries concurrently
+            sub_results = await run_subqueries(request, sql_query)
+            results = []
+            for rows in sub_results.values():
+                if isinstance(rows, list):
+                    results.extend(rows)
+            sql_query = ";\n".join(sql_query)
+            request.query = sql_query
+        else:
+            # Execute the generated query
+            request.query = sql_query
+            result = await execute_query(request)
+            results = result["results"]
+            sub_results = None
+
+        # Start the summary call while the response payload is assembled
+        summary_task = asyncio.create_task(generate_summary(request, results))
+
+        response = {
             "sql_query": sql_query,
-            "results": result["results"],
-            "summary": summary
+            "results": results,
         }
+        if sub_results is not None:
+            response["sub_results"] = sub_results
+        response["summary"] = await summary_task
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Generating SQL query using AI
-async def generate_sql_with_ai(request: QueryRequest) -> str:
+# Generating SQL query using AI (a JSON array of queries for multi-part questions)
+async def generate_sql_with_ai(request: QueryRequest) -> Union[str, List[str]]:
+    # Serve previously generated SQL for the same normalized question
+    cache_key = get_sql_cache_key(request)
+    cached_sql = _SQL_CACHE.get(cache_key)
+    if cached_sql is not None:
+        return cached_sql
+
     prompt = f"""
     Convert the following user query into a read-only {request.dbType.upper()} SELECT query.
     
@@ -165,35 +732,55 @@ async def generate_sql_with_ai(request: QueryRequest) -> str:
     - ONLY generate SELECT statements
     - Use proper {request.dbType.upper()} syntax
     - Return only the SQL query, no explanations
+    - If the question asks several independent things, return a JSON array of SELECT queries, one per part
     
     User Query: {request.query}
     """
     
     try:
-        if request.aiProvider == "openai": # OpenAI API
-            openai.api_key = request.apiKey
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=1000
-            )
-            sql = response.choices[0].message.content.strip()
+        if request.aiProvider == "openai": # OpenAI API, streamed so the
+            # response is accumulated as tokens arrive instead of waiting
+            # for the provider to assemble the full completion
+            client = get_openai_client(request.apiKey)
+            async with _LLM_SEM:
+                stream = await client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.2,
+                    max_tokens=1000,
+                    stream=True
+                )
+                chunks = []
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        chunks.append(chunk.choices[0].delta.content)
+            sql = "".join(chunks).strip()
         else:  # Gemini API
-            client = genai.Client(api_key=request.apiKey)
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt
-            )
+            client = get_gemini_client(request.apiKey)
+            async with _LLM_SEM:
+                response = await client.aio.models.generate_content(
+                    model="gemini-2.0-flash-exp",
+                    contents=prompt
+                )
             sql = response.text.strip()
         
         # Clean up the response
-        sql = re.sub(r"^```sql\s*|\s*```$", "", sql, flags=re.MULTILINE)
-        
+        sql = _FENCE_RE.sub("", sql).strip()
+
+        # A JSON array means the question decomposed into sub-queries
+        if sql.startswith("["):
+            sub_queries = [q.strip() for q in json.loads(sql)]
+            for q in sub_queries:
+                if not is_safe_select(q, request.dbType):
+                    raise ValueError("Generated query is not a SELECT statement, only SELECT queries are allowed")
+            _SQL_CACHE[cache_key] = sub_queries
+            return sub_queries
+
         # Validate
-        if not is_safe_select(sql):
+        if not is_safe_select(sql, request.dbType):
             raise ValueError("Generated query is not a SELECT statement, only SELECT queries are allowed")
-        
+
+        _SQL_CACHE[cache_key] = sql
         return sql
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
@@ -202,7 +789,13 @@ async def generate_sql_with_ai(request: QueryRequest) -> str:
 async def generate_summary(request: QueryRequest, results: List[Dict]) -> str:
     if not results:
         return "No results found."
-    
+
+    # Serve a previously generated summary for the same question and results
+    cache_key = get_summary_cache_key(request, results)
+    cached_summary = _SUMMARY_CACHE.get(cache_key)
+    if cached_summary is not None:
+        return cached_summary
+
     prompt = f"""
     Summarize the following query results in 1-2 clear sentences.
     
@@ -215,21 +808,26 @@ async def generate_summary(request: QueryRequest, results: List[Dict]) -> str:
     
     try:
         if request.aiProvider == "openai":
-            openai.api_key = request.apiKey
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=200
-            )
-            return response.choices[0].message.content.strip()
+            client = get_openai_client(request.apiKey)
+            async with _LLM_SEM:
+                response = await client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.3,
+                    max_tokens=200
+                )
+            summary = response.choices[0].message.content.strip()
         else:  # gemini
-            client = genai.Client(api_key=request.apiKey)
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt
-            )
-            return response.text.strip()
+            client = get_gemini_client(request.apiKey)
+            async with _LLM_SEM:
+                response = await client.aio.models.generate_content(
+                    model="gemini-2.0-flash-exp",
+                    contents=prompt
+                )
+            summary = response.text.strip()
+
+        _SUMMARY_CACHE[cache_key] = summary
+        return summary
     except:
         return f"Found {len(results)} results."
 
@@ -243,28 +841,37 @@ async def serve_landing():
 async def serve_dashboard():
     return FileResponse("dashboard.html")
 
+# Static portion of the health payload, built once at import time
+_HEALTH_INFO = {
+    "app_name": "SQL Chat",
+    "app_description": "SQL Chat is a web application that allows users to generate SQL queries using natural language and execute them on their database.",
+    "app_version": "1.0.0",
+    "status": "SQL Chat is running",
+    "developer": {
+        "name": "Dhanraj D. Hasure",
+        "role": "Full Stack Developer",
+        "experience": "1.5+ years",
+        "skills": {
+            "backend": ["Java", "Spring Boot", "REST APIs", "Python", "FastAPI"],
+            "frontend": ["HTML", "CSS", "JavaScript", "Angular"],
+            "databases": ["PostgreSQL", "MySQL", "Redis", "MongoDB"],
+            "tools": ["Git", "GitHub", "Docker", "Postman"],
+            "other": ["AWS", "Render", "Netlify", "OpenAI", "Gemini"]
+        },
+        "github": "https://github.com/dhanraj-hasure",
+        "portfolio": "https://dhanraj-hasure.github.io"
+    }
+}
+
+# Health payload serialized once at import time; only the timestamp changes
+_HEALTH_TEMPLATE = orjson.dumps({**_HEALTH_INFO, "timestamp": "__TS__"})
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {
-        "app_name": "SQL Chat",
-        "app_description": "SQL Chat is a web application that allows users to generate SQL queries using natural language and execute them on their database.",
-        "app_version": "1.0.0",
-        "status": "SQL Chat is running",
-        "timestamp": datetime.datetime.now().isoformat(),
-        "developer": {
-            "name": "Dhanraj D. Hasure",
-            "role": "Full Stack Developer",
-            "experience": "1.5+ years",
-            "skills": {
-                "backend": ["Java", "Spring Boot", "REST APIs", "Python", "FastAPI"],
-                "frontend": ["HTML", "CSS", "JavaScript", "Angular"],
-                "databases": ["PostgreSQL", "MySQL", "Redis", "MongoDB"],
-                "tools": ["Git", "GitHub", "Docker", "Postman"],
-                "other": ["AWS", "Render", "Netlify", "OpenAI", "Gemini"]
-            },
-            "github": "https://github.com/dhanraj-hasure",
-            "portfolio": "https://dhanraj-hasure.github.io"
-        }
-    }
+    timestamp = orjson.dumps(datetime.datetime.now().isoformat())
+    return Response(
+        content=_HEALTH_TEMPLATE.replace(b'"__TS__"', timestamp),
+        media_type="application/json",
+    )
 